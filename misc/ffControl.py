@@ -1,4 +1,4 @@
-#!/usr/bin/python
+#!/usr/bin/python3
 
 # Copyright (C) 2013-2015 by Massachusetts Institute of Technology
 #
@@ -30,27 +30,51 @@ parser.add_option("--procIdx", type="int", default=0, dest="procIdx", help="Proc
 parser.add_option("--lineMatch", default=" ROI", dest="lineMatch", help="Matching line to stdin will trigger signal")
 parser.add_option("--maxMatches", type="int", default=0, dest="maxMatches", help="Exit after this many matches (0 to disable)")
 parser.add_option("--fftogglePath", default="./build/opt", dest="fftogglePath", help="")
+parser.add_option("--fifo", default="", dest="fifo", help="Instead of scanning stdin, create this named pipe and signal once per shmid written to it (one per line)")
 (opts, args) = parser.parse_args()
 
+SHMID_PREFIX = "[H] Global segment shmid = "
+
+fftoggleBin = os.path.join(opts.fftogglePath, "fftoggle")
+procIdxStr = str(opts.procIdx)
+def fftoggle(shmid):
+    subprocess.call([fftoggleBin, str(shmid), procIdxStr])
+
 targetShmid = -1
 matches = 0
-while matches < opts.maxMatches or opts.maxMatches <= 0:
+if opts.fifo:
+    # Doorbell mode: whoever detects the ROI writes the shmid to the pipe, so we just block on it
+    os.mkfifo(opts.fifo)
+    print("Waiting for shmids on", opts.fifo)
     try:
-        line = sys.stdin.readline()
-    except:
-        print "stdin done, exiting"
-        break
-
-    if line.startswith("[H] Global segment shmid = "):
-        targetShmid = int(line.split("=")[1].lstrip().rstrip())
-        print "Target shmid is", targetShmid
-
-    if line.find(opts.lineMatch) >= 0:
-        if targetShmid >= 0:
-            print "Match, calling fftoggle"
-            matches += 1
-            subprocess.call([os.path.join(opts.fftogglePath, "fftoggle"), str(targetShmid), str(opts.procIdx)])
-        else:
-            print "Match but shmid is not valid, not sending signal (are you sure you specified procIdx correctly? it's not the PID)"
-print "Done, %d matches" % matches
+        while matches < opts.maxMatches or opts.maxMatches <= 0:
+            with open(opts.fifo) as fifo:  # blocks until a writer opens the pipe, reopened after it closes
+                for line in fifo:
+                    try:
+                        targetShmid = int(line)
+                    except ValueError:
+                        print(f"Invalid shmid {line.strip()!r} in fifo, not sending signal")
+                        continue
+                    print(f"Doorbell for shmid {targetShmid}, calling fftoggle")
+                    matches += 1
+                    fftoggle(targetShmid)
+                    if matches == opts.maxMatches: break
+    finally:
+        os.unlink(opts.fifo)
+else:
+    for line in sys.stdin:
+        if line.startswith(SHMID_PREFIX):
+            targetShmid = int(line.split("=")[1].strip())
+            print("Target shmid is", targetShmid)
 
+        if opts.lineMatch in line:
+            if targetShmid >= 0:
+                print("Match, calling fftoggle")
+                matches += 1
+                fftoggle(targetShmid)
+                if matches == opts.maxMatches: break
+            else:
+                print("Match but shmid is not valid, not sending signal (are you sure you specified procIdx correctly? it's not the PID)")
+    else:
+        print("stdin done, exiting")
+print(f"Done, {matches} matches")
@@ -1,14 +1,20 @@
 # Return a pretty-printed short git version (like hg/svnversion)
-import os
-def cmd(c): return os.popen(c).read().strip()
-branch = cmd("git rev-parse --abbrev-ref HEAD")
-revnum = cmd("git log | grep ^commit | wc -l")
-rshort = cmd("git rev-parse --short HEAD")
-dfstat = cmd("git diff HEAD --shortstat")
-dfhash = cmd("git diff HEAD | md5sum")[:8]
-shstat = dfstat.replace(" files changed", "fc").replace(" file changed", "fc") \
-               .replace(" insertions(+)", "+").replace(" insertion(+)", "+") \
-               .replace(" deletions(-)", "-").replace(" deletion(-)", "-") \
-               .replace(",", "")
-diff = "clean" if len(dfstat) == 0 else shstat +  " " + dfhash
-print ":".join([branch, revnum, rshort, diff])
+import hashlib, subprocess
+# Like check_output, but does not fail outside a git checkout (outputs are just empty)
+def run(args): return subprocess.Popen(args, stdout=subprocess.PIPE).communicate()[0]
+def cmd(args): return run(args).decode().strip()
+branch = cmd(["git", "rev-parse", "--abbrev-ref", "HEAD"])
+revnum = cmd(["git", "rev-list", "--count", "HEAD"])
+rshort = cmd(["git", "rev-parse", "--short", "HEAD"])
+# Exit code 1 means there are changes; skip diffing the tree twice in the (common) clean case
+if subprocess.call(["git", "diff", "--quiet", "HEAD"]) == 1:
+    dfstat = cmd(["git", "diff", "HEAD", "--shortstat"])
+    dfhash = hashlib.md5(run(["git", "diff", "HEAD"])).hexdigest()[:8]
+    shstat = dfstat.replace(" files changed", "fc").replace(" file changed", "fc") \
+                   .replace(" insertions(+)", "+").replace(" insertion(+)", "+") \
+                   .replace(" deletions(-)", "-").replace(" deletion(-)", "-") \
+                   .replace(",", "")
+    diff = shstat + " " + dfhash
+else:
+    diff = "clean"
+print(":".join([branch, revnum, rshort, diff]))
@@ -1,4 +1,4 @@
-#!/usr/bin/python
+#!/usr/bin/python3
 
 # Copyright (C) 2013-2015 by Massachusetts Institute of Technology
 #
@@ -23,46 +23,55 @@
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
 
-import os, sys
+import mmap, os, sys
+from concurrent.futures import ProcessPoolExecutor
 
 #dryRun = True
 dryRun = False
 
-srcs = sys.argv[1:]
-
 def sortIncludes(lines, fname):
+    ownNeedle = '"' + fname + '.'
     def prefix(l):
-        if l.find("<") >= 0:
+        if "<" in l:
             return "2"
             # if you want to differentiate...
-            #if l.find(".h") >= 0: return "2" # C system headers
+            #if ".h" in l: return "2" # C system headers
             #else: return "3" # C++ system headers
         else:
-            if l.find('"' + fname + '.') >= 0: return "1" # Our own header
+            if ownNeedle in l: return "1" # Our own header
             return "4" # Program headers
 
-    ll = [prefix(l) + l.strip() for l in lines if len(l.strip()) > 0]
+    stripped = [l for l in (l.strip() for l in lines) if l]
+    ll = [prefix(l) + l for l in stripped]
     sl = [l[1:] for l in sorted(ll)]
     if lines[-1].strip() == "": sl += [""]
-    #print sl
+    #print(sl)
     return sl
 
-for src in srcs:
-    f = open(src, 'r+')  # we open for read/write here to fail early on read-only files
-    txt = f.read()
-    f.close()
+# Lints a single file; returns the report lines instead of printing so files can run in parallel
+def lintFile(src):
+    f = open(src, 'r+', newline='')  # we open for read/write here to fail early on read-only files
 
     bName = os.path.basename(src).split(".")[0]
-    print bName
+    out = [bName]
+
+    # Check for includes through an mmap first, so files without any are never read and decoded
+    hasIncludes = False
+    if os.fstat(f.fileno()).st_size > 0:  # can't mmap empty files
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            hasIncludes = mm.find(b"#include") >= 0
+    if not hasIncludes:
+        f.close()
+        out.append(f"{src} 0 blocks")
+        return out
 
-    lines = [l for l in txt.split("\n")]
+    lines = f.read().split("\n")
 
     includeBlocks = []
     blockStart = -1
-    for i in range(len(lines)):
-        l = lines[i].strip()
-        isInclude = l.startswith("#include") and l.find("NOLINT") == -1
-        isEmpty = l == ""
+    for i, l in enumerate([l.strip() for l in lines]):
+        isInclude = l.startswith("#include") and "NOLINT" not in l
+        isEmpty = not l
         if blockStart == -1:
             if isInclude: blockStart = i  # start block
         else:
@@ -70,29 +79,40 @@ for src in srcs:
                 includeBlocks.append((blockStart, i))
                 blockStart = -1
 
-    print src, len(includeBlocks), "blocks"
+    out.append(f"{src} {len(includeBlocks)} blocks")
 
     newIncludes = [(s , e, sortIncludes(lines[s:e], bName)) for (s, e) in includeBlocks]
+    dirty = False
     for (s , e, ii) in newIncludes:
         # Print?
         if ii == lines[s:e]:
-            print "Block in lines %d-%d matches" % (s, e-1)
+            out.append(f"Block in lines {s}-{e-1} matches")
             continue
+        dirty = True
         for i in range(s, e):
-            print "%3d: %s%s | %s" % (i, lines[i], " "*(40 - len(lines[i][:39])), ii[i-s] if i-s < len(ii) else "")
-        print ""
-
-    prevIdx = 0
-    newLines = []
-    for (s , e, ii) in newIncludes:
-        newLines += lines[prevIdx:s] + ii
-        prevIdx = e
-    newLines += lines[prevIdx:]
-
-    if not dryRun and len(includeBlocks):
-        outTxt = "\n".join(newLines)
-        f = open(src, 'w')
-        f.write(outTxt)
-        f.close()
-
-print "Done!"
+            out.append(f"{i:3d}: {lines[i]}{' '*(40 - len(lines[i][:39]))} | {ii[i-s] if i-s < len(ii) else ''}")
+        out.append("")
+
+    # Only rewrite files with unsorted blocks, reusing the read/write handle
+    if dirty and not dryRun:
+        prevIdx = 0
+        newLines = []
+        for (s , e, ii) in newIncludes:
+            newLines += lines[prevIdx:s] + ii
+            prevIdx = e
+        newLines += lines[prevIdx:]
+
+        f.seek(0)
+        f.truncate()
+        f.writelines(l + "\n" for l in newLines[:-1])
+        f.write(newLines[-1])
+    f.close()
+    return out
+
+if __name__ == "__main__":
+    srcs = sys.argv[1:]
+    with ProcessPoolExecutor() as pool:
+        # map() returns results in order, so the output matches a serial run
+        for out in pool.map(lintFile, srcs, chunksize=16):
+            print("\n".join(out))
+    print("Done!")
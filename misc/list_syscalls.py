@@ -1,9 +1,21 @@
-#!/usr/bin/python
+#!/usr/bin/python3
 # Produces a list of syscalls in the current system
-import os, re
-syscallCmd = "gcc -E -dD /usr/include/asm/unistd.h | grep __NR"
-syscallDefs = os.popen(syscallCmd).read()
-sysList = [(int(numStr), name) for (name, numStr) in re.findall("#define __NR_(.*?) (\d+)", syscallDefs)]
-denseList = ["INVALID"]*(max([num for (num, name) in sysList]) + 1)
-for (num, name) in sysList: denseList[num] = name
-print '"' + '",\n"'.join(denseList) + '"'
+import os, re, subprocess
+
+def parseDefs(defs): return [(int(m.group(2)), m.group(1)) for m in re.finditer(r"#define __NR_(\S+) (\d+)", defs)]
+
+# On x86-64, the numbers are plain #defines in unistd_64.h, so read it directly and skip running gcc.
+# Don't use asm-generic/unistd.h here: its numbering is for other architectures.
+sysList = []
+for header in ["/usr/include/asm/unistd_64.h", "/usr/include/x86_64-linux-gnu/asm/unistd_64.h"]:
+    if os.path.exists(header):
+        sysList = parseDefs(open(header).read())
+        if sysList: break
+
+if not sysList:
+    syscallDefs = subprocess.run(["gcc", "-E", "-dD", "/usr/include/asm/unistd.h"],
+                                 capture_output=True, check=True, text=True).stdout
+    sysList = parseDefs(syscallDefs)
+
+sysNames = dict(sysList)  # on duplicate numbers, the last definition wins
+print('"' + '",\n"'.join(sysNames.get(num, "INVALID") for num in range(max(sysNames) + 1)) + '"')
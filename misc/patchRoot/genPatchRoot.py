@@ -1,4 +1,4 @@
-#!/usr/bin/python
+#!/usr/bin/python3
 
 # Copyright (C) 2013-2015 by Massachusetts Institute of Technology
 #
@@ -22,29 +22,32 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
-import os, string, sys
+import os, re, shutil, stat, string, sys
 
 class XTemplate(string.Template):
     delimiter = "$"
     escaped = "$$"
 
-def cmd(c):
-    f = os.popen(c)
-    r = f.read()
-    f.close()
-    return r.rstrip() # rm last newline
+def templateToFormat(t):
+    # Translate XTemplate syntax ($VAR, ${VAR}, $$) into a str.format string, escaping literal braces
+    t = t.replace("{", "{{").replace("}", "}}")
+    return re.sub(r"\$(?:(\$)|(\w+)|\{\{(\w+)\}\})",
+            lambda m: "$" if m.group(1) else "{" + (m.group(2) or m.group(3)) + "}", t)
+
+def mkdirs(d):
+    os.makedirs(d, exist_ok=True)
+
+def writeFile(path, s):
+    # Equivalent to echo s > path, without spawning a shell
+    with open(path, "w") as f:
+        f.write(str(s) + "\n")
 
 def getMask(start, end):
-    cur = 0
-    l = []
-    for i in range(256):
-        j = i % 32
-        if i >= start and i <= end: cur |= 1 << j
-        if (i + 1) % 32 == 0:
-            l.append(cur)
-            cur = 0
+    # 256-bit mask with bits [start, end] set, as 8 comma-separated 32-bit words (MSW first)
+    m = ((1 << (end - start + 1)) - 1) << start
+    l = [(m >> (32*i)) & 0xffffffff for i in range(8)]
     l.reverse()
-    return ",".join("%08x" % n for n in l)
+    return ",".join(f"{n:08x}" for n in l)
 
 from optparse import OptionParser
 
@@ -64,92 +67,96 @@ ncpus = options.ncpus
 root = options.dir
 progDir = os.path.dirname(os.path.abspath(__file__)) + "/"
 
-print "Will produce a tree for %d CPUs/cores in %s" % (ncpus, root)
+print(f"Will produce a tree for {ncpus} CPUs/cores in {root}")
 
 if ncpus < 1:
-    print "ERROR: Need >= 1 cpus!"
+    print("ERROR: Need >= 1 cpus!")
     sys.exit(1)
 
 if os.path.exists(root) and not options.force:
-    print "ERROR: Dir already exists, aborting"
+    print("ERROR: Dir already exists, aborting")
     sys.exit(1)
 
 if len(args):
-    print "ERROR: No positional arguments taken, aborting"
+    print("ERROR: No positional arguments taken, aborting")
     sys.exit(1)
 
-cmd("mkdir -p " + root)
+mkdirs(root)
 if not os.path.exists(root):
-    print "ERROR: Could not create %s, aborting" % root
+    print(f"ERROR: Could not create {root}, aborting")
     sys.exit(1)
 
 ## /proc
 
-# cpuinfo
-cpuinfoTemplate = XTemplate(open(progDir + "cpuinfo.template", "r").read())
-cmd("mkdir -p %s/proc" % root)
-f = open(root + "/proc/cpuinfo", "w")
-for cpu in range(ncpus):
-    print >>f, cpuinfoTemplate.substitute({"CPU" : str(cpu), "NCPUS" : ncpus}),
-f.close()
+# cpuinfo (substituted once per cpu, so use a format string instead of a Template)
+cpuinfoFormat = templateToFormat(open(progDir + "cpuinfo.template", "r").read()).format_map
+mkdirs(root + "/proc")
+with open(root + "/proc/cpuinfo", "w") as f:
+    f.write("".join(cpuinfoFormat({"CPU" : cpu, "NCPUS" : ncpus}) for cpu in range(ncpus)))
 
 # stat
 cpuAct = [int(x) for x in "665084 119979939 9019834 399242499 472611 20 159543 0 0 0".split(" ")]
-totalAct = [x*ncpus for x in cpuAct]
-cpuStat = "cpu  " + " ".join([str(x) for x in totalAct])
-for cpu in range(ncpus):
-    cpuStat += ("\ncpu%d " % cpu) + " ".join([str(x) for x in cpuAct])
+cpuActStr = " ".join(str(x) for x in cpuAct)
+totalActStr = " ".join(str(x*ncpus) for x in cpuAct)
+cpuStat = "\n".join([f"cpu  {totalActStr}"] + [f"cpu{cpu} {cpuActStr}" for cpu in range(ncpus)])
 statTemplate = XTemplate(open(progDir + "stat.template", "r").read())
 f = open(root + "/proc/stat", "w")
-print >>f, statTemplate.substitute({"CPUSTAT" : cpuStat}),
+f.write(statTemplate.substitute({"CPUSTAT" : cpuStat}))
 f.close()
 
 ## /sys
 
 # cpus
 cpuDir = root + "/sys/devices/system/cpu/"
-cmd("mkdir -p " + cpuDir)
+mkdirs(cpuDir)
 cpuList = "0-" + str(ncpus-1) if ncpus > 1 else "0"
 for f in ["online", "possible", "present"]:
-    cmd("echo %s > %s" % (cpuList, cpuDir + f))
-cmd("echo > " + cpuDir + "offline")
-cmd("echo 0 > " + cpuDir + "sched_mc_power_savings")
+    writeFile(cpuDir + f, cpuList)
+writeFile(cpuDir + "offline", "")
+writeFile(cpuDir + "sched_mc_power_savings", 0)
 maxCpus = max(ncpus, 255)
-cmd("echo %d > %s" % (maxCpus, cpuDir + "kernel_max"))
+writeFile(cpuDir + "kernel_max", maxCpus)
+if maxCpus > 255:
+    print("WARN: These many cpus have not been tested, x2APIC systems may be different...")
 coreSiblingsMask = getMask(0, ncpus)
+threadSiblingsMasks = [getMask(cpu, cpu) for cpu in range(ncpus)]
 for cpu in range(ncpus):
-    d = cpuDir + "cpu" + str(cpu) + "/"
+    d = f"{cpuDir}cpu{cpu}/"
     td = d + "topology/"
-    cmd("mkdir -p " + td)
-    if maxCpus > 255:
-        print "WARN: These many cpus have not been tested, x2APIC systems may be different..."
-    cmd("echo %d > %s" % (cpu, td + "core_id"))
-    cmd("echo %s > %s" % (cpuList, td + "core_siblings_list"))
-    cmd("echo %d > %s" % (cpu, td + "thread_siblings_list"))
-    cmd("echo 0 > " + td + "physical_package_id")
-    cmd("echo %s > %s" % (coreSiblingsMask, td + "core_siblings"))
-    cmd("echo %s > %s" % (getMask(cpu, cpu), td + "thread_siblings"))
-    cmd("echo 1 > " + d + "online")
+    mkdirs(td)
+    writeFile(td + "core_id", cpu)
+    writeFile(td + "core_siblings_list", cpuList)
+    writeFile(td + "thread_siblings_list", cpu)
+    writeFile(td + "physical_package_id", 0)
+    writeFile(td + "core_siblings", coreSiblingsMask)
+    writeFile(td + "thread_siblings", threadSiblingsMasks[cpu])
+    writeFile(d + "online", 1)
 
 # nodes
 nodeDir = root + "/sys/devices/system/node/"
-cmd("mkdir -p " + nodeDir)
-for f in ["has_normal_memory", "online", "possible"]: cmd("echo 0 > " + nodeDir + f)
-cmd("echo > " + nodeDir + "has_cpu")
+mkdirs(nodeDir)
+for f in ["has_normal_memory", "online", "possible"]: writeFile(nodeDir + f, 0)
+writeFile(nodeDir + "has_cpu", "")
 
 n0Dir = nodeDir + "node0/"
-cmd("mkdir -p " + n0Dir)
+mkdirs(n0Dir)
 for cpu in range(ncpus):
-    cmd("ln -s " + cpuDir + "cpu" + str(cpu) + " " + n0Dir)
-cmd("cp -r %s/nodeFiles/* %s" % (progDir, n0Dir))
-cmd("echo %s > %s" % (coreSiblingsMask, n0Dir + "cpumap"))
-cmd("echo %s > %s" % (cpuList, n0Dir + "cpulist"))
+    link = f"{n0Dir}cpu{cpu}"
+    if not os.path.lexists(link): os.symlink(f"{cpuDir}cpu{cpu}", link)  # may exist with -f
+shutil.copytree(progDir + "nodeFiles", n0Dir, symlinks=True, dirs_exist_ok=True)
+writeFile(n0Dir + "cpumap", coreSiblingsMask)
+writeFile(n0Dir + "cpulist", cpuList)
 
 # misc
-cmd("mkdir -p " + root + "/sys/bus/pci/devices")
+mkdirs(root + "/sys/bus/pci/devices")
 
 # make read-only
 if not options.force:
-    cmd("chmod a-w -R " + root)
+    # Like chmod a-w -R, symlinks are skipped (their targets are in the tree anyway)
+    def rmWrite(p): os.chmod(p, stat.S_IMODE(os.lstat(p).st_mode) & ~0o222)
+    rmWrite(root)
+    for d, subdirs, files in os.walk(root):
+        for p in [os.path.join(d, n) for n in subdirs + files]:
+            if not os.path.islink(p): rmWrite(p)
 
 